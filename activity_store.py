@@ -0,0 +1,61 @@
+import json
+import os
+from pathlib import Path
+
+STORE_DIR = "activity_store"
+
+# Strava summary fields worth keeping locally
+KEPT_FIELDS = ("type", "distance", "moving_time", "start_date_local", "start_date", "name")
+
+
+def store_path(user_hash, store_dir=STORE_DIR):
+    return Path(store_dir) / f"{user_hash}.json"
+
+
+def load_activities(user_hash, store_dir=STORE_DIR):
+    """Return {activity_id: summary} for a user, or {} if nothing is stored yet."""
+    try:
+        with store_path(user_hash, store_dir).open("r") as f:
+            return json.load(f).get("activities", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_activities(user_hash, activities, store_dir=STORE_DIR):
+    """Merge freshly fetched Strava activities into the user's local store."""
+    stored = load_activities(user_hash, store_dir)
+    for act in activities:
+        if act.get("id") is None:
+            continue
+        summary = {field: act.get(field) for field in KEPT_FIELDS}
+        summary["summary_polyline"] = (act.get("map") or {}).get("summary_polyline")
+        stored[str(act["id"])] = summary
+    path = store_path(user_hash, store_dir)
+    path.parent.mkdir(exist_ok=True)
+    # Write then rename so coach-view readers never see a half-written file
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w") as f:
+        json.dump({"activities": stored}, f)
+    os.replace(tmp, path)
+
+
+def store_version(user_hash, store_dir=STORE_DIR):
+    """Modification stamp of a user's store, for cache keys. None if there's no store."""
+    try:
+        stat = store_path(user_hash, store_dir).stat()
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+
+def daily_run_miles(activities):
+    """Total run miles per local date ('YYYY-MM-DD') from stored activities."""
+    miles = {}
+    for act in activities.values():
+        if act.get("type") != "Run":
+            continue
+        day = (act.get("start_date_local") or act.get("start_date") or "").split("T")[0]
+        if not day:
+            continue
+        miles[day] = miles.get(day, 0.0) + (act.get("distance") or 0) * 0.000621371
+    return miles
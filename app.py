@@ -1,4 +1,5 @@
 import streamlit as st
+import streamlit.components.v1 as components
 import os
 import sys
 
@@ -44,10 +45,31 @@ import hashlib
 from pathlib import Path
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
 from pace_utils import marathon_pace_seconds, get_pace_range
+from history_grid import (
+    DEFAULT_PAGE_SIZE,
+    filter_date_range,
+    page_count,
+    page_for_date,
+    get_page,
+)
+from plan_library import DEFAULT_PLAN_ID, load_catalogue, load_plan, save_uploaded_plan
+from plan_adaptation import adapt_plan
+from activity_store import load_activities, save_activities
+from route_utils import fit_zoom, get_routes, simplify_route, to_lnglat
+from coach_summary import summarize_roster
+from session_utils import (
+    load_cookie_config,
+    create_session,
+    resume_session,
+    revoke_session,
+    revalidate_profile_async,
+)
 import requests
 import time
 import os
+import numpy as np
 import pandas as pd
+import pydeck as pdk
 import re
 from datetime import datetime, timedelta
 from urllib.parse import urlencode, quote
@@ -133,6 +155,18 @@ if "current_user" not in st.session_state:
     st.session_state.current_user = None
 if "google_oauth_component" not in st.session_state:
     st.session_state.google_oauth_component = None
+if "session_id" not in st.session_state:
+    st.session_state.session_id = None
+if "pending_session_cookie" not in st.session_state:
+    st.session_state.pending_session_cookie = None
+
+GOOGLE_USERINFO_URL = "https://openidconnect.googleapis.com/v1/userinfo"
+
+GOOGLE_TOKEN_URL = "https://oauth2.googleapis.com/token"
+
+# Signed session cookie settings; cookies are only issued when a signing key is configured
+cookie_config = load_cookie_config()
+cookie_config["key"] = st.secrets.get("cookie_key") or os.getenv("COOKIE_KEY")
 
 def get_google_oauth_component():
     """Initialize Google OAuth component."""
@@ -141,8 +175,8 @@ def get_google_oauth_component():
             client_id=google_client_id,
             client_secret=google_client_secret,
             authorize_endpoint="https://accounts.google.com/o/oauth2/auth",
-            token_endpoint="https://oauth2.googleapis.com/token",
-            refresh_token_endpoint="https://oauth2.googleapis.com/token",
+            token_endpoint=GOOGLE_TOKEN_URL,
+            refresh_token_endpoint=GOOGLE_TOKEN_URL,
             revoke_token_endpoint="https://oauth2.googleapis.com/revoke",
         )
     return st.session_state.google_oauth_component
@@ -150,7 +184,7 @@ def get_google_oauth_component():
 def get_user_info(access_token):
     """Get user info from Google API."""
     headers = {"Authorization": f"Bearer {access_token}"}
-    response = requests.get("https://openidconnect.googleapis.com/v1/userinfo", headers=headers)
+    response = requests.get(GOOGLE_USERINFO_URL, headers=headers, timeout=10)
     if response.status_code == 200:
         return response.json()
     return None
@@ -172,6 +206,68 @@ def load_user_settings(user_hash):
         st.error(f"Error loading user settings: {e}")
         return {}
 
+def write_session_cookie(value, max_age):
+    """Set the session cookie on the parent page.
+
+    Streamlit can't set response headers, so the cookie is written from JS and
+    therefore can't be HttpOnly: any script on the page can read it. Secure is
+    added only when the page is served over HTTPS, so plain-HTTP deployments
+    still get a cookie.
+    """
+    cookie = f"{cookie_config['name']}={value}; max-age={int(max_age)}; path=/; SameSite=Lax"
+    components.html(
+        "<script>"
+        f"var cookie = {json.dumps(cookie)};"
+        "if (window.parent.location.protocol === 'https:') { cookie += '; Secure'; }"
+        "window.parent.document.cookie = cookie;"
+        "</script>",
+        height=0,
+    )
+
+def restore_session():
+    """Restore the signed-in user from the session cookie, if present and valid."""
+    try:
+        cookie_value = st.context.cookies.get(cookie_config["name"])
+    except Exception:
+        return False
+    session_id, user = resume_session(cookie_value, cookie_config["key"])
+    if not user:
+        return False
+    st.session_state.current_user = user
+    st.session_state.session_id = session_id
+    revalidate_profile_async(session_id, {
+        "client_id": google_client_id,
+        "client_secret": google_client_secret,
+        "token_url": GOOGLE_TOKEN_URL,
+        "userinfo_url": GOOGLE_USERINFO_URL,
+    })
+    return True
+
+def load_all_user_settings():
+    """Load every user's settings, keyed by user hash."""
+    try:
+        settings_path = Path("user_settings.json")
+        if settings_path.exists():
+            with settings_path.open("r") as f:
+                return json.load(f)
+        return {}
+    except Exception as e:
+        st.error(f"Error loading user settings: {e}")
+        return {}
+
+def get_coach_roster(coach_email):
+    """Athletes who have named this user as their coach."""
+    coach_email = (coach_email or "").strip().lower()
+    roster = []
+    for user_hash, settings in load_all_user_settings().items():
+        if (settings.get("coach_email") or "").strip().lower() == coach_email and coach_email:
+            roster.append({
+                "user_hash": user_hash,
+                "name": settings.get("name") or f"Athlete {user_hash[:6]}",
+                "settings": settings,
+            })
+    return sorted(roster, key=lambda a: a["name"].lower())
+
 def save_user_settings(user_hash, settings):
     """Save user-specific settings to JSON file."""
     try:
@@ -217,6 +313,8 @@ def google_login():
         redirect_uri=redirect_uri,
         scope="openid email profile",
         key="google_oauth",
+        # Offline access returns a refresh token so resumed sessions can be revalidated
+        extras_params={"access_type": "offline", "prompt": "consent"},
         use_container_width=True
     )
     
@@ -229,6 +327,16 @@ def google_login():
                 "picture": user_info.get("picture", ""),
                 "access_token": result["token"]["access_token"]
             }
+            if cookie_config["key"]:
+                cookie_value = create_session(
+                    st.session_state.current_user,
+                    cookie_config["key"],
+                    cookie_config["expiry_days"],
+                    refresh_token=result["token"].get("refresh_token"),
+                )
+                st.session_state.session_id = cookie_value.split(".", 1)[0]
+                # The cookie is written on the next run; a component rendered right before rerun is dropped
+                st.session_state.pending_session_cookie = cookie_value
             st.rerun()
 
 def show_header():
@@ -243,7 +351,10 @@ def show_header():
             user = st.session_state.current_user
             st.markdown(f"**{user['name']}**")
             if st.button("Sign Out", key="signout"):
+                revoke_session(st.session_state.session_id)
+                st.session_state.session_id = None
                 st.session_state.current_user = None
+                # Revoking server-side is enough; the stale cookie no longer resolves to a session
                 st.rerun()
 
 def get_strava_auth_url():
@@ -432,6 +543,11 @@ def get_strava_activities(start_date=None, end_date=None, max_pages=4):
             all_acts.extend(batch)
             if len(batch) < params_base.get("per_page", 30):
                 break
+        # Keep a local copy so coach views can read it without calling Strava
+        try:
+            save_activities(user_hash, all_acts)
+        except OSError:
+            pass
         return all_acts
     except Exception as e:
         st.error(f"Error fetching Strava activities: {e}")
@@ -443,6 +559,9 @@ def training_plan_setup():
     settings = load_user_settings(user_hash)
     
     st.header("Training Plan Setup")
+
+    if st.session_state.get("plan_upload_message"):
+        st.success(st.session_state.pop("plan_upload_message"))
     
     col1, col2 = st.columns(2)
     
@@ -459,12 +578,52 @@ def training_plan_setup():
             value=settings.get("goal_time", "4:00:00"),
             help="Your target marathon finish time"
         )
+
+    catalogue = load_catalogue()
+    plan_ids = list(catalogue)
+    current_plan = settings.get("plan_id", DEFAULT_PLAN_ID)
+    plan_id = st.selectbox(
+        "Plan",
+        plan_ids,
+        index=plan_ids.index(current_plan) if current_plan in plan_ids else 0,
+        format_func=lambda pid: catalogue[pid]["name"],
+        help="Training plans available in the plan library"
+    ) if plan_ids else None
+
+    if plan_id:
+        entry = catalogue[plan_id]
+        st.caption(
+            f"{entry['weeks']} weeks · peak {entry['peak_miles']:g} mi/week · "
+            f"{entry['total_miles']:g} mi total"
+        )
+        with st.expander("Workout mix"):
+            st.write(entry["workout_mix"])
+
+    coach_email = st.text_input(
+        "Coach Email (optional)",
+        value=settings.get("coach_email", ""),
+        help="Share your plan and training with a coach who signs in with this email"
+    )
+
+    uploaded = st.file_uploader("Add a custom plan (CSV with a 'Plan' column)", type="csv")
+    if uploaded is not None and st.button("Add to Plan Library"):
+        try:
+            new_id = save_uploaded_plan(uploaded.name, uploaded.getvalue())
+            save_user_settings(user_hash, {**settings, "plan_id": new_id})
+            # Shown after the rerun; a message rendered right before st.rerun() never reaches the page
+            st.session_state.plan_upload_message = f"Added plan `{new_id}`."
+            st.rerun()
+        except (ValueError, UnicodeDecodeError) as e:
+            st.error(f"Couldn't read that plan: {e}")
     
     if st.button("Save Training Plan", use_container_width=True):
         new_settings = {
             **settings,
             "start_date": start_date.strftime("%Y-%m-%d"),
             "goal_time": goal_time,
+            "plan_id": plan_id or DEFAULT_PLAN_ID,
+            "coach_email": coach_email.strip(),
+            "name": st.session_state.current_user.get("name"),
         }
         save_user_settings(user_hash, new_settings)
         st.success("Training plan saved!")
@@ -476,53 +635,59 @@ def show_dashboard():
     """Display the main dashboard."""
     user_hash = get_user_hash(st.session_state.current_user["email"])
     settings = load_user_settings(user_hash)
+
+    # Coaches land on their roster; only the selected view is rendered, so the
+    # coach view doesn't pay for a Strava fetch of the coach's own plan
+    roster = get_coach_roster(st.session_state.current_user["email"])
+    if roster:
+        view = st.radio("View", ["Coach", "My Training"], horizontal=True, key="dashboard_view")
+        if view == "Coach":
+            show_coach_view(roster)
+            return
     
     if not settings.get("goal_time") or not settings.get("start_date"):
         st.info("Please complete your training plan setup first.")
         return training_plan_setup()
 
     # Tabs for different sections
-    tab1, tab2 = st.tabs(["Training Plan", "Settings"])
+    tab1, tab2, tab3 = st.tabs(["Training Plan", "Routes", "Settings"])
     
     with tab1:
         show_training_plan_table(settings)
-    
+
     with tab2:
+        show_route_maps(settings)
+    
+    with tab3:
         training_plan_setup()
 
-def generate_training_plan(start_date):
-    """Loads the training plan from run_plan.csv and adjusts dates."""
+ACTIVITY_MAP = {
+    "GA": "General Aerobic",
+    "Rec": "Recovery",
+    "MLR": "Medium-Long Run",
+    "LR": "Long Run",
+    "SP": "Sprints",
+    "V8": "VO₂Max",
+    "LT": "Lactate Threshold",
+    "HMP": "Half Marathon Pace",
+    "MP": "Marathon Pace"
+}
+
+def expand_abbreviations(activity_string):
+    """Expand plan shorthand like 'MLR 12' into readable workout names."""
+    # Sort keys by length, descending, to match longer abbreviations first.
+    sorted_keys = sorted(ACTIVITY_MAP.keys(), key=len, reverse=True)
+    for abbr in sorted_keys:
+        # Use word boundaries to avoid replacing parts of other words.
+        activity_string = re.sub(r'\b' + re.escape(abbr) + r'\b', ACTIVITY_MAP[abbr], activity_string)
+    return activity_string
+
+def generate_training_plan(start_date, plan_id=DEFAULT_PLAN_ID):
+    """Loads a plan from the plan library and adjusts dates."""
     try:
-        # Load the plan using the first row as the header
-        plan_df = pd.read_csv("run_plan.csv", header=0)
-        plan_df.columns = [col.strip() for col in plan_df.columns]
-
-        # Drop rows that are separators or don't have an activity
-        plan_df.dropna(subset=['Plan'], inplace=True)
-        plan_df = plan_df[plan_df['Plan'].str.strip() != '']
-        
-        activities = plan_df['Plan'].str.strip().copy().reset_index(drop=True)
-        
-        activity_map = {
-            "GA": "General Aerobic",
-            "Rec": "Recovery",
-            "MLR": "Medium-Long Run",
-            "LR": "Long Run",
-            "SP": "Sprints",
-            "V8": "VO₂Max",
-            "LT": "Lactate Threshold",
-            "HMP": "Half Marathon Pace",
-            "MP": "Marathon Pace"
-        }
-        
-        def expand_abbreviations(activity_string):
-            # Sort keys by length, descending, to match longer abbreviations first.
-            sorted_keys = sorted(activity_map.keys(), key=len, reverse=True)
-            for abbr in sorted_keys:
-                # Use word boundaries to avoid replacing parts of other words.
-                activity_string = re.sub(r'\b' + re.escape(abbr) + r'\b', activity_map[abbr], activity_string)
-            return activity_string
-
+        plan = load_plan(plan_id)
+        plan_df = pd.DataFrame(plan["days"])
+        activities = plan_df['Plan']
         expanded_activities = activities.apply(expand_abbreviations)
 
         num_days = len(activities)
@@ -532,19 +697,55 @@ def generate_training_plan(start_date):
         new_plan_df = pd.DataFrame({
             'Date': dates,
             'Day': days_of_week,
+            'Week': plan_df['Week'],
             'Activity_Abbr': activities,
-            'Activity': expanded_activities
+            'Activity': expanded_activities,
+            'Planned Miles': plan_df['Miles'],
+            'Workout Type': plan_df['Type'],
         })
 
         return new_plan_df
 
     except FileNotFoundError:
-        st.error("`run_plan.csv` not found. Please make sure it's in the root directory.")
+        st.error(f"Plan `{plan_id}` not found. Please pick another plan in Settings.")
         return pd.DataFrame()
     except Exception as e:
-        st.error(f"Error processing `run_plan.csv`: {e}")
+        st.error(f"Error processing plan `{plan_id}`: {e}")
         return pd.DataFrame()
 
+@st.cache_resource
+def adaptation_caches():
+    """Per-user week caches for the adaptation engine, shared across reruns and sessions."""
+    return {}
+
+def apply_plan_adaptation(merged_df, settings):
+    """Add Status/Note columns and swap in rescheduled workouts from the adaptation engine."""
+    merged_df = merged_df.copy()
+    merged_df["Actual Miles"] = pd.to_numeric(merged_df["Actual Miles"], errors="coerce")
+    actuals = merged_df.groupby("Date")["Actual Miles"].sum(min_count=1).dropna().to_dict()
+
+    plan_days = (
+        merged_df.drop_duplicates("Date")[["Date", "Week", "Activity_Abbr", "Planned Miles", "Workout Type"]]
+        .rename(columns={"Activity_Abbr": "Plan", "Planned Miles": "Miles", "Workout Type": "Type"})
+        .to_dict("records")
+    )
+    user_hash = get_user_hash(st.session_state.current_user["email"])
+    cache_key = (user_hash, settings.get("plan_id", DEFAULT_PLAN_ID), settings["start_date"])
+    cache = adaptation_caches().setdefault(cache_key, {})
+    adapted = adapt_plan(plan_days, actuals, datetime.now().date(), cache)
+
+    adapted_df = pd.DataFrame(adapted)[["Date", "Plan", "Miles", "Type", "Status", "Note"]]
+    merged_df = pd.merge(merged_df, adapted_df, on="Date", how="left")
+    changed = merged_df["Plan"].notna() & (merged_df["Plan"] != merged_df["Activity_Abbr"])
+    merged_df.loc[changed, "Activity_Abbr"] = merged_df.loc[changed, "Plan"]
+    merged_df.loc[changed, "Activity"] = merged_df.loc[changed, "Plan"].apply(expand_abbreviations)
+    # Moved and trimmed days carry new targets, not just new text
+    has_adapted = merged_df["Miles"].notna()
+    merged_df.loc[has_adapted, "Planned Miles"] = merged_df.loc[has_adapted, "Miles"]
+    merged_df.loc[has_adapted, "Workout Type"] = merged_df.loc[has_adapted, "Type"]
+    merged_df["Status"] = merged_df["Status"].str.capitalize()
+    return merged_df.drop(columns=["Plan", "Miles", "Type"])
+
 def show_training_plan_table(settings):
     """Display the training plan in a table."""
     st.header("Your Training Plan")
@@ -553,7 +754,7 @@ def show_training_plan_table(settings):
     goal_time = settings["goal_time"]
     
     # Generate plan
-    plan_df = generate_training_plan(start_date)
+    plan_df = generate_training_plan(start_date, settings.get("plan_id", DEFAULT_PLAN_ID))
     
     if plan_df.empty:
         return
@@ -604,16 +805,18 @@ def show_training_plan_table(settings):
         merged_df["Actual Miles"] = None
         merged_df["Actual Pace"] = None
 
+    # Reschedule the rest of the plan around missed or moved workouts
+    merged_df = apply_plan_adaptation(merged_df, settings)
+
     # Calculate suggested pace
     gmp_sec = marathon_pace_seconds(goal_time)
     merged_df["Suggested Pace"] = merged_df["Activity_Abbr"].apply(lambda x: get_pace_range(x, gmp_sec))
 
-    # Reorder and format columns
-    merged_df = merged_df[["Date", "Day", "Activity", "Suggested Pace", "Actual Miles", "Actual Pace"]]
-    merged_df['Date'] = pd.to_datetime(merged_df['Date']).dt.strftime('%m-%d')
+    # Reorder columns
+    merged_df = merged_df[["Date", "Day", "Activity", "Planned Miles", "Suggested Pace", "Actual Miles", "Actual Pace", "Status", "Note"]]
 
     # Display table
-    st.dataframe(merged_df.fillna(""), height=600)
+    show_plan_grid(merged_df, plan_min, plan_max)
 
     # Diagnostics
     with st.expander("Strava connection details"):
@@ -627,12 +830,160 @@ def show_training_plan_table(settings):
             "activities_returned": len(activities) if isinstance(activities, list) else 0,
         })
 
+# Total points drawn across every route in the season heatmap
+SEASON_POINT_BUDGET = 20000
+
+def show_route_maps(settings):
+    """Route map for a single plan day and a heatmap of the whole season's runs."""
+    st.header("Routes")
+    start_date = datetime.strptime(settings["start_date"], "%Y-%m-%d").date()
+    plan_df = generate_training_plan(start_date, settings.get("plan_id", DEFAULT_PLAN_ID))
+    if plan_df.empty:
+        return
+    plan_by_date = dict(zip(plan_df["Date"].astype(str), plan_df["Activity"]))
+
+    # Routes come from the local activity store, refreshed by the Training Plan tab's Strava sync
+    user_hash = get_user_hash(st.session_state.current_user["email"])
+    runs = {
+        activity_id: act for activity_id, act in load_activities(user_hash).items()
+        if act.get("type") == "Run" and act.get("summary_polyline")
+        and (act.get("start_date_local") or act.get("start_date") or "").split("T")[0] in plan_by_date
+    }
+    if not runs:
+        st.info("No mapped runs in this plan yet. Routes appear after your next Strava sync.")
+        return
+    routes = get_routes({activity_id: act["summary_polyline"] for activity_id, act in runs.items()})
+
+    runs_by_date = {}
+    for activity_id, act in runs.items():
+        day = (act.get("start_date_local") or act.get("start_date")).split("T")[0]
+        runs_by_date.setdefault(day, []).append(activity_id)
+    dates = sorted(runs_by_date, reverse=True)
+
+    day = st.selectbox(
+        "Plan day",
+        dates,
+        format_func=lambda d: f"{datetime.strptime(d, '%Y-%m-%d'):%a %m-%d} · {plan_by_date[d]}",
+    )
+    # Polylines that decode to no points (e.g. treadmill runs) have nothing to draw
+    day_ids = [activity_id for activity_id in runs_by_date[day] if len(routes[activity_id])]
+    day_routes = [routes[activity_id] for activity_id in day_ids]
+    if not day_routes:
+        st.info("No route data for this day.")
+    else:
+        show_day_route(day_routes, [runs[activity_id].get("name") or "" for activity_id in day_ids])
+
+    st.subheader("Season Heatmap")
+    season_routes = [route for route in routes.values() if len(route)]
+    if not season_routes:
+        st.info("No route data for this plan yet.")
+        return
+    season_zoom = fit_zoom(season_routes)
+    per_route = max(2, SEASON_POINT_BUDGET // len(season_routes))
+    points = [{"position": p} for route in season_routes
+              for p in to_lnglat(simplify_route(route, season_zoom, per_route))]
+    season_center = np.concatenate([r[:, :2] for r in season_routes]).mean(axis=0)
+    st.pydeck_chart(pdk.Deck(
+        layers=[pdk.Layer("HeatmapLayer", points, get_position="position", radius_pixels=20)],
+        initial_view_state=pdk.ViewState(latitude=float(season_center[0]), longitude=float(season_center[1]),
+                                         zoom=season_zoom - 0.5),
+    ))
+    st.caption(f"{len(season_routes)} runs · {len(points)} points drawn")
+
+def show_day_route(day_routes, names):
+    """Map one day's non-empty routes, simplified for the zoom that fits them."""
+    zoom = fit_zoom(day_routes)
+    paths = [{"path": to_lnglat(simplify_route(route, zoom)), "name": name}
+             for route, name in zip(day_routes, names)]
+    center = np.concatenate([r[:, :2] for r in day_routes]).mean(axis=0)
+    st.pydeck_chart(pdk.Deck(
+        layers=[pdk.Layer("PathLayer", paths, get_path="path", get_color=[252, 76, 2],
+                          width_min_pixels=3, pickable=True)],
+        initial_view_state=pdk.ViewState(latitude=float(center[0]), longitude=float(center[1]), zoom=zoom - 0.5),
+        tooltip={"text": "{name}"},
+    ))
+
+def show_coach_view(roster):
+    """Summary table of every athlete coached by the current user."""
+    st.header("Your Athletes")
+    st.caption("Built from each athlete's last Strava sync.")
+
+    summaries = summarize_roster(roster)
+    rows = []
+    for s in summaries:
+        if s.get("error"):
+            rows.append({"Athlete": s["name"], "Plan": s["error"]})
+            continue
+        rows.append({
+            "Athlete": s["name"],
+            "Plan": s["plan"],
+            "Week": f"{s['week']}/{s['weeks']}",
+            "This Week (mi)": f"{s['week_actual']:g} / {s['week_planned']:g}",
+            "To Date (mi)": f"{s['actual_to_date']:g} / {s['planned_to_date']:g}",
+            "Compliance %": s["compliance"],
+            "Last 4 Weeks (mi)": ", ".join(f"{m:g}" for m in s["recent_weekly"]),
+            "Missed Key Workouts": s["missed_key_workouts"],
+            "Last Run": s["last_run"],
+        })
+    st.dataframe(pd.DataFrame(rows).fillna(""), hide_index=True, use_container_width=True)
+
+def show_plan_grid(merged_df, plan_min, plan_max):
+    """Render the plan in a paged AgGrid, serializing only the rows on the visible page.
+
+    merged_df is built day by day from the plan, so it is already in date order.
+    """
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        date_range = st.date_input(
+            "Show dates",
+            value=(plan_min, plan_max),
+            min_value=plan_min,
+            max_value=plan_max,
+            key="plan_grid_range",
+        )
+    # The range picker returns a single date while the user is mid-selection
+    if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+        range_start, range_end = date_range
+    else:
+        range_start, range_end = plan_min, plan_max
+    window_df = filter_date_range(merged_df, range_start, range_end)
+
+    pages = page_count(len(window_df), DEFAULT_PAGE_SIZE)
+    with col2:
+        page = st.number_input(
+            f"Page (of {pages})",
+            min_value=1,
+            max_value=pages,
+            value=page_for_date(window_df, datetime.now().date(), DEFAULT_PAGE_SIZE),
+            step=1,
+            key=f"plan_grid_page_{range_start}_{range_end}",
+        )
+
+    page_df = get_page(window_df, int(page), DEFAULT_PAGE_SIZE).copy()
+    page_df["Date"] = pd.to_datetime(page_df["Date"]).dt.strftime("%m-%d")
+    page_df = page_df.fillna("")
+
+    gb = GridOptionsBuilder.from_dataframe(page_df)
+    gb.configure_default_column(resizable=True, sortable=False, filter=False)
+    gb.configure_column("Activity", flex=2)
+    AgGrid(
+        page_df,
+        gridOptions=gb.build(),
+        height=min(600, 40 + 32 * max(len(page_df), 1)),
+        fit_columns_on_grid_load=True,
+        key=f"plan_grid_{range_start}_{range_end}_{page}",
+    )
+
 def main():
     """Main application logic."""
-    # Check if user is logged in
-    if not st.session_state.current_user:
+    # Check if user is logged in, resuming a previous session from its cookie first
+    if not st.session_state.current_user and not restore_session():
         google_login()
         return
+
+    if st.session_state.pending_session_cookie:
+        write_session_cookie(st.session_state.pending_session_cookie, cookie_config["expiry_days"] * 86400)
+        st.session_state.pending_session_cookie = None
     
     # Show header
     show_header()
@@ -0,0 +1,139 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+
+from activity_store import STORE_DIR, daily_run_miles, load_activities, store_version
+from plan_adaptation import KEY_TYPES, adapt_plan
+from plan_library import CACHE_DIR, DEFAULT_PLAN_ID, PLANS_DIR, load_plan, plan_version
+
+# Below this many uncached athletes, pool start-up costs more than it saves
+MIN_PARALLEL = 8
+RECENT_WEEKS = 4
+
+_executor = None
+_executor_lock = threading.Lock()
+# Shared by every coach session's script thread; always touch it under _results_lock
+_results = {}
+_results_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # Forking Streamlit's multi-threaded server can copy held locks into workers; spawn starts clean
+            _executor = ProcessPoolExecutor(max_workers=os.cpu_count() or 2,
+                                            mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def athlete_summary(athlete):
+    """Plan-vs-actual, weekly rollups and compliance for one athlete.
+
+    athlete is a dict with user_hash, name, plan_id, start_date and today
+    (ISO date strings) plus plans_dir, cache_dir and store_dir. Only reads
+    local files, so it is safe to run in a worker process.
+    """
+    today = date.fromisoformat(athlete["today"])
+    start = date.fromisoformat(athlete["start_date"])
+    summary = {"user_hash": athlete["user_hash"], "name": athlete["name"]}
+    try:
+        plan = load_plan(athlete["plan_id"], athlete["plans_dir"], athlete["cache_dir"])
+    except (OSError, ValueError) as e:
+        return {**summary, "error": str(e)}
+
+    miles_by_day = daily_run_miles(load_activities(athlete["user_hash"], athlete["store_dir"]))
+    days = [{**d, "Date": start + timedelta(days=i)} for i, d in enumerate(plan["days"])]
+    actuals = {}
+    for d in days:
+        ran = miles_by_day.get(d["Date"].isoformat())
+        if ran:
+            actuals[d["Date"]] = ran
+
+    weekly = {}
+    for d in days:
+        week = weekly.setdefault(d["Week"], {"week": d["Week"], "start": d["Date"], "planned": 0.0, "actual": 0.0})
+        week["planned"] += d["Miles"]
+        week["actual"] += actuals.get(d["Date"], 0.0)
+
+    past = [d for d in days if d["Date"] < today]
+    planned_to_date = sum(d["Miles"] for d in past)
+    actual_to_date = sum(actuals.get(d["Date"], 0.0) for d in past)
+    adapted = adapt_plan(days, actuals, today)
+    # Races aren't rescheduled, but a skipped race is still worth a coach's attention
+    missed_key = sum(1 for d in adapted if d["Status"] == "missed" and (d["Type"] in KEY_TYPES or d["Type"] == "Race"))
+
+    current = [w for w in weekly.values() if w["start"] <= today]
+    this_week = current[-1] if current else None
+    recent = current[-RECENT_WEEKS:]
+    run_dates = [d for d in miles_by_day if d <= athlete["today"]]
+
+    return {
+        **summary,
+        "plan": plan["name"] or athlete["plan_id"],
+        "week": this_week["week"] if this_week else 0,
+        "weeks": len(weekly),
+        "planned_to_date": round(planned_to_date, 1),
+        "actual_to_date": round(actual_to_date, 1),
+        "compliance": round(100 * actual_to_date / planned_to_date) if planned_to_date else None,
+        "week_planned": round(this_week["planned"], 1) if this_week else 0.0,
+        "week_actual": round(this_week["actual"], 1) if this_week else 0.0,
+        "recent_weekly": [round(w["actual"], 1) for w in recent],
+        "missed_key_workouts": missed_key,
+        "last_run": max(run_dates) if run_dates else None,
+    }
+
+
+def summarize_roster(athletes, today=None, plans_dir=PLANS_DIR, cache_dir=CACHE_DIR, store_dir=STORE_DIR):
+    """Summaries for every athlete in the roster, in roster order.
+
+    athletes are dicts with user_hash, name and the athlete's settings. Results
+    are cached per athlete until their settings, plan file, activity store or
+    the date change; uncached athletes are computed in a process pool.
+    """
+    today = (today or datetime.now().date()).isoformat()
+    jobs = []
+    keys = []
+    for athlete in athletes:
+        settings = athlete.get("settings", {})
+        job = {
+            "user_hash": athlete["user_hash"],
+            "name": athlete["name"],
+            "plan_id": settings.get("plan_id", DEFAULT_PLAN_ID),
+            "start_date": settings.get("start_date"),
+            "today": today,
+            "plans_dir": plans_dir,
+            "cache_dir": cache_dir,
+            "store_dir": store_dir,
+        }
+        keys.append((job["user_hash"], job["plan_id"], job["start_date"], today,
+                     store_version(job["user_hash"], store_dir), job["name"],
+                     plan_version(job["plan_id"], plans_dir)))
+        jobs.append(job)
+
+    with _results_lock:
+        pending = [(key, job) for key, job in zip(keys, jobs)
+                   if key not in _results and job["start_date"]]
+    # Compute outside the lock so one coach's slow roster doesn't block the others
+    if len(pending) >= MIN_PARALLEL:
+        results = list(_get_executor().map(athlete_summary, [job for _, job in pending],
+                                           chunksize=max(1, len(pending) // (4 * (os.cpu_count() or 2)))))
+    else:
+        results = [athlete_summary(job) for _, job in pending]
+
+    live = set(keys)
+    roster = {key[0] for key in keys}
+    with _results_lock:
+        for (key, _), result in zip(pending, results):
+            _results[key] = result
+        # Drop this roster's entries for superseded settings/plan/activity versions
+        for key in [k for k in _results if k[0] in roster and k not in live]:
+            del _results[key]
+        summaries = [_results.get(key) for key in keys]
+
+    return [
+        summary or {"user_hash": job["user_hash"], "name": job["name"], "error": "No plan set up"}
+        for summary, job in zip(summaries, jobs)
+    ]
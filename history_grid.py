@@ -0,0 +1,28 @@
+import math
+
+# Four training weeks per page keeps the grid short enough to render without scrolling lag
+DEFAULT_PAGE_SIZE = 28
+
+
+def filter_date_range(df, start, end, date_col="Date"):
+    """Rows with start <= date <= end, keeping the frame's (date) order."""
+    dates = df[date_col]
+    return df[(dates >= start) & (dates <= end)]
+
+
+def page_count(n_rows, page_size=DEFAULT_PAGE_SIZE):
+    """Number of pages needed to show n_rows (at least one)."""
+    return max(1, math.ceil(n_rows / page_size))
+
+
+def page_for_date(df, day, page_size=DEFAULT_PAGE_SIZE, date_col="Date"):
+    """1-based page number containing the given date in a date-ordered frame, clamped to the available pages."""
+    pos = int((df[date_col] < day).sum())
+    pages = page_count(len(df), page_size)
+    return min(pages, pos // page_size + 1)
+
+
+def get_page(df, page, page_size=DEFAULT_PAGE_SIZE):
+    """Slice out one 1-based page of rows."""
+    start = (page - 1) * page_size
+    return df.iloc[start:start + page_size]
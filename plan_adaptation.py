@@ -0,0 +1,195 @@
+import hashlib
+
+from plan_library import with_planned_miles
+
+# Workouts that need an easy day either side of them
+HARD_TYPES = {"Long Run", "Marathon Pace", "Lactate Threshold", "VO₂Max", "Race"}
+# Workouts worth moving when missed; easy mileage is just dropped, and races
+# happen on a fixed date, so a missed race is only marked missed
+KEY_TYPES = (HARD_TYPES - {"Race"}) | {"Medium-Long Run"}
+# Days a moved key workout may replace
+EASY_TYPES = {"Rest", "Recovery", "General Aerobic"}
+
+SHORTENED_RATIO = 0.75
+SWAP_TOLERANCE = 0.2
+MIN_EASY_MILES = 3.0
+
+
+def _day_key(day):
+    return (day["Date"], day["Plan"], day["Miles"], day["Type"])
+
+
+def _week_fingerprint(week_days, actuals, today, carried, before):
+    """Hash everything a week's adaptation depends on, including work carried in from the week before."""
+    h = hashlib.sha1()
+    for day in week_days:
+        h.update(repr((_day_key(day), actuals.get(day["Date"]), day["Date"] < today)).encode())
+    h.update(repr([_day_key(day) for day in carried]).encode())
+    h.update(repr(before and (_day_key(before), before["Status"])).encode())
+    return h.hexdigest()
+
+
+def _classify(day, actual):
+    if day["Miles"] <= 0:
+        return "extra" if actual else "rest"
+    if not actual:
+        return "missed"
+    if actual < day["Miles"] * SHORTENED_RATIO:
+        return "shortened"
+    return "done"
+
+
+def _is_hard(day):
+    return day["Type"] in HARD_TYPES and day["Status"] not in ("missed", "dropped", "rest")
+
+
+def _find_slot(workout, days, today, before=None):
+    """First remaining easy day that can take workout without putting two hard days together."""
+    for i, candidate in enumerate(days):
+        if candidate["Date"] < today or candidate["Type"] not in EASY_TYPES or candidate["Status"] != "planned":
+            continue
+        neighbours = days[max(0, i - 1):i] + days[i + 1:i + 2]
+        if i == 0 and before is not None:
+            neighbours.append(before)
+        if workout["Type"] in HARD_TYPES and any(_is_hard(n) for n in neighbours):
+            continue
+        return candidate
+    return None
+
+
+def adapt_week(week_days, actuals, today, carried=(), before=None):
+    """Adapt one week of the plan to what was actually run.
+
+    week_days are dicts with Date, Plan, Miles and Type. Past days are marked
+    done, shortened, missed or swapped. Key workouts carried over from the
+    previous week, then this week's missed key workouts, are moved onto the
+    first remaining easy day that keeps hard days apart (before is the previous
+    week's last adapted day, for spacing across the boundary). Remaining easy
+    days are then trimmed so the week never exceeds its planned mileage.
+
+    Returns (days, unplaced, carried_notes): the adapted days with Status and
+    Note added, this week's missed key workouts that found no slot (to offer
+    to the next week), and a note per carried workout's date saying where it went.
+    """
+    days = [{**day, "Status": "planned", "Note": ""} for day in week_days]
+    past = [d for d in days if d["Date"] < today]
+    future = [d for d in days if d["Date"] >= today]
+
+    for day in past:
+        day["Status"] = _classify(day, actuals.get(day["Date"]))
+
+    # A missed workout run on another day of the same week counts as swapped, not missed
+    extras = [d for d in past if d["Status"] == "extra"]
+    for day in past:
+        if day["Status"] != "missed":
+            continue
+        for other in extras:
+            ran = actuals.get(other["Date"]) or 0
+            if abs(ran - day["Miles"]) <= day["Miles"] * SWAP_TOLERANCE:
+                day["Status"] = "swapped"
+                day["Note"] = f"Run on {other['Date']:%a}"
+                other["Status"] = "swapped"
+                other["Note"] = f"Stood in for {day['Date']:%a}"
+                extras.remove(other)
+                break
+
+    carried_notes = {}
+    for workout in carried:
+        slot = _find_slot(workout, days, today, before)
+        if slot is None:
+            carried_notes[workout["Date"]] = "Dropped: no easy day left this week or next"
+            continue
+        carried_notes[workout["Date"]] = f"Moved to {slot['Date']:%a %m-%d}"
+        slot.update({
+            "Plan": workout["Plan"],
+            "Miles": workout["Miles"],
+            "Type": workout["Type"],
+            "Status": "moved",
+            "Note": f"Moved from {workout['Date']:%a %m-%d}",
+        })
+
+    unplaced = []
+    for day in past:
+        if day["Status"] != "missed" or day["Type"] not in KEY_TYPES:
+            continue
+        slot = _find_slot(day, days, today, before)
+        if slot is None:
+            day["Note"] = "Carried to next week"
+            unplaced.append({key: day[key] for key in ("Date", "Plan", "Miles", "Type")})
+            continue
+        day["Note"] = f"Moved to {slot['Date']:%a}"
+        slot.update({
+            "Plan": day["Plan"],
+            "Miles": day["Miles"],
+            "Type": day["Type"],
+            "Status": "moved",
+            "Note": f"Moved from {day['Date']:%a}",
+        })
+
+    # Keep the week within its planned mileage by trimming the remaining easy runs
+    budget = sum(d["Miles"] for d in week_days) - sum(actuals.get(d["Date"]) or 0 for d in past)
+    scheduled = sum(d["Miles"] for d in future)
+    excess = scheduled - max(budget, 0)
+    easy = sorted((d for d in future if d["Type"] in ("Recovery", "General Aerobic") and d["Status"] == "planned"),
+                  key=lambda d: d["Miles"], reverse=True)
+    for day in easy:
+        if excess <= 0:
+            break
+        cut = min(excess, day["Miles"])
+        new_miles = day["Miles"] - cut
+        if 0 < new_miles < MIN_EASY_MILES:
+            new_miles = 0.0
+        if new_miles == 0:
+            day.update({"Plan": "Rest", "Type": "Rest", "Note": "Rest to stay within weekly mileage"})
+        else:
+            new_miles = round(new_miles, 1)
+            day["Note"] = f"Shortened from {day['Miles']:g} to {new_miles:g} mi to stay within weekly mileage"
+            day["Plan"] = with_planned_miles(day["Plan"], new_miles)
+        excess -= day["Miles"] - new_miles
+        day["Miles"] = new_miles
+        day["Status"] = "adjusted"
+
+    return days, unplaced, carried_notes
+
+
+def adapt_plan(plan_days, actuals, today, cache=None):
+    """Adapt a dated plan to actual mileage, recomputing only weeks that changed.
+
+    plan_days need Date, Week, Plan, Miles and Type; actuals maps date -> miles.
+    A key workout with no slot left in its own week is offered to the next
+    week, which therefore counts as affected too. cache is a dict the caller
+    keeps between syncs (e.g. per user); weeks whose plan, actuals, past/future
+    split and carried-in work are unchanged are reused from it.
+    """
+    if cache is None:
+        cache = {}
+    weeks = {}
+    for day in plan_days:
+        weeks.setdefault(day["Week"], []).append(day)
+
+    results = []
+    carried = []
+    before = None
+    for week, week_days in weeks.items():
+        fingerprint = _week_fingerprint(week_days, actuals, today, carried, before)
+        hit = cache.get(week)
+        if hit is None or hit[0] != fingerprint:
+            hit = (fingerprint, adapt_week(week_days, actuals, today, carried, before))
+            cache[week] = hit
+        days, carried, carried_notes = hit[1]
+        results.append((days, carried_notes))
+        before = days[-1] if days else None
+    for stale in set(cache) - set(weeks):
+        del cache[stale]
+
+    # Say where carried workouts ended up, copying rather than mutating cached days
+    adapted = []
+    for i, (days, _) in enumerate(results):
+        notes = results[i + 1][1] if i + 1 < len(results) else {}
+        for day in days:
+            if day["Date"] in notes:
+                day = {**day, "Note": notes[day["Date"]]}
+            elif day["Note"] == "Carried to next week" and i + 1 == len(results):
+                day = {**day, "Note": "Dropped: no easy day left this week"}
+            adapted.append(day)
+    return adapted
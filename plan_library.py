@@ -0,0 +1,242 @@
+import csv
+import io
+import json
+import os
+import pickle
+import re
+from functools import lru_cache
+from pathlib import Path
+
+PLANS_DIR = "plans"
+CACHE_DIR = ".plan_cache"
+CATALOGUE_FILE = "catalogue.json"
+DEFAULT_PLAN_ID = "pfitz_18_55"
+
+# Bump when the parsed form changes so stale pickles are ignored
+CACHE_VERSION = 2
+
+WORKOUT_TYPES = ["Rest", "Recovery", "General Aerobic", "Medium-Long Run", "Long Run",
+                 "Marathon Pace", "Lactate Threshold", "VO₂Max", "Race", "Other"]
+
+# Checked in order; more specific abbreviations must come first
+_TYPE_PATTERNS = [
+    ("Rest", re.compile(r"^rest\b", re.I)),
+    ("Medium-Long Run", re.compile(r"^MLR\b")),
+    ("Long Run", re.compile(r"^LR\b")),
+    ("Marathon Pace", re.compile(r"^MP\b")),
+    ("Lactate Threshold", re.compile(r"^(LT|HMP)\b")),
+    ("VO₂Max", re.compile(r"^V\d")),
+    ("Recovery", re.compile(r"^Rec\b")),
+    ("General Aerobic", re.compile(r"^GA\b")),
+    ("Race", re.compile(r"race|26\.2", re.I)),
+]
+
+_MILES_RE = re.compile(r"(\d+(?:\.\d+)?)(?!\s*[kK\d.])")
+_KM_RE = re.compile(r"(\d+(?:\.\d+)?)\s*[kK]\b")
+KM_TO_MILES = 0.621371
+
+
+def workout_type(activity):
+    """Classify a plan entry like 'MLR 12' or 'V8 w/ 5 x 600' into a workout type."""
+    activity = (activity or "").strip()
+    for name, pattern in _TYPE_PATTERNS:
+        if pattern.search(activity):
+            return name
+    return "Other"
+
+
+def planned_miles(activity):
+    """Planned distance of an entry: the last mileage figure before any 'w/' detail.
+
+    Entries given only in kilometres, like '8K-15K tune-up race', use the first
+    (lower) distance converted to miles.
+    """
+    head = (activity or "").split(" w/")[0]
+    matches = _MILES_RE.findall(head)
+    if matches:
+        return float(matches[-1])
+    km = _KM_RE.findall(head)
+    return round(float(km[0]) * KM_TO_MILES, 1) if km else 0.0
+
+
+def with_planned_miles(activity, miles):
+    """Rewrite an entry's distance, e.g. ('GA 10 w/ strides', 6) -> 'GA 6 w/ strides'."""
+    head, sep, tail = (activity or "").partition(" w/")
+    matches = list(_MILES_RE.finditer(head))
+    if not matches:
+        return f"{head} {miles:g}{sep}{tail}"
+    last = matches[-1]
+    return f"{head[:last.start()]}{miles:g}{head[last.end():]}{sep}{tail}"
+
+
+def parse_plan_csv(text):
+    """Parse a plan CSV into {name, days}; days are dicts with Week, Plan, Miles, Type.
+
+    The first header cell is the plan name, rows with a label in the first
+    column start a new week, and blank 'Plan' rows (totals, separators) are dropped.
+    Malformed CSV raises ValueError, like any other unusable plan.
+    """
+    try:
+        return _parse_plan_rows(csv.reader(io.StringIO(text)))
+    except csv.Error as e:
+        raise ValueError(f"malformed plan CSV: {e}") from e
+
+
+def _parse_plan_rows(reader):
+    header = [col.strip() for col in next(reader, [])]
+    if "Plan" not in header:
+        raise ValueError("plan CSV must have a 'Plan' column")
+    plan_col = header.index("Plan")
+    name = header[0] if header and header[0] and header[0] != "Plan" else None
+
+    days = []
+    week = 0
+    for row in reader:
+        if len(row) <= plan_col:
+            continue
+        activity = row[plan_col].strip()
+        if not activity:
+            continue
+        label = row[0].strip() if plan_col > 0 else ""
+        # Plans without week labels fall back to seven-day weeks
+        if (plan_col > 0 and label) or (plan_col == 0 and len(days) % 7 == 0) or week == 0:
+            week += 1
+        days.append({
+            "Week": week,
+            "Plan": activity,
+            "Miles": planned_miles(activity),
+            "Type": workout_type(activity),
+        })
+    if not days:
+        raise ValueError("plan CSV has no workouts")
+    return {"name": name, "days": days}
+
+
+def summarize_plan(plan):
+    """Catalogue entry for a parsed plan: week count, peak weekly mileage and workout mix."""
+    weekly = {}
+    mix = {}
+    for day in plan["days"]:
+        weekly[day["Week"]] = weekly.get(day["Week"], 0.0) + day["Miles"]
+        mix[day["Type"]] = mix.get(day["Type"], 0) + 1
+    return {
+        "weeks": len(weekly),
+        "days": len(plan["days"]),
+        "peak_miles": round(max(weekly.values()), 1),
+        "total_miles": round(sum(weekly.values()), 1),
+        "workout_mix": {t: mix[t] for t in WORKOUT_TYPES if t in mix},
+    }
+
+
+def _plan_path(plan_id, plans_dir=PLANS_DIR):
+    return Path(plans_dir) / f"{plan_id}.csv"
+
+
+def _stamp(path):
+    stat = path.stat()
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+@lru_cache(maxsize=32)
+def _load_plan_cached(path_str, stamp, cache_dir):
+    """Parse a plan once per file version, preferring the pickled form on disk."""
+    path = Path(path_str)
+    cache_path = Path(cache_dir) / f"{path.stem}.pkl"
+    try:
+        with cache_path.open("rb") as f:
+            cached = pickle.load(f)
+        if cached.get("version") == CACHE_VERSION and cached.get("stamp") == list(stamp):
+            return cached["plan"]
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    plan = parse_plan_csv(path.read_text(encoding="utf-8-sig"))
+    try:
+        Path(cache_dir).mkdir(exist_ok=True)
+        with cache_path.open("wb") as f:
+            pickle.dump({"version": CACHE_VERSION, "stamp": list(stamp), "plan": plan}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+    except OSError:
+        pass
+    return plan
+
+
+def load_plan(plan_id, plans_dir=PLANS_DIR, cache_dir=CACHE_DIR):
+    """Return the parsed plan for plan_id. Raises FileNotFoundError if it isn't in the library."""
+    path = _plan_path(plan_id, plans_dir)
+    if not path.exists():
+        raise FileNotFoundError(f"plan '{plan_id}' not found in {plans_dir}/")
+    return _load_plan_cached(str(path), tuple(_stamp(path)), cache_dir)
+
+
+def plan_version(plan_id, plans_dir=PLANS_DIR):
+    """Modification stamp of a plan file, for cache keys. None if the plan doesn't exist."""
+    try:
+        return tuple(_stamp(_plan_path(plan_id, plans_dir)))
+    except OSError:
+        return None
+
+
+def load_catalogue(plans_dir=PLANS_DIR, cache_dir=CACHE_DIR):
+    """Return {plan_id: entry} for every plan in the library.
+
+    Entries are kept in an on-disk index and only recomputed for plans whose
+    file changed since the index was written.
+    """
+    index_path = Path(cache_dir) / CATALOGUE_FILE
+    try:
+        with index_path.open("r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        index = {}
+
+    catalogue = {}
+    changed = False
+    for path in sorted(Path(plans_dir).glob("*.csv")):
+        plan_id = path.stem
+        stamp = _stamp(path)
+        entry = index.get(plan_id)
+        if not entry or entry.get("stamp") != stamp or entry.get("version") != CACHE_VERSION:
+            try:
+                plan = load_plan(plan_id, plans_dir, cache_dir)
+            except (ValueError, UnicodeDecodeError):
+                continue
+            entry = {
+                "name": plan["name"] or plan_id.replace("_", " "),
+                **summarize_plan(plan),
+                "stamp": stamp,
+                "version": CACHE_VERSION,
+            }
+            changed = True
+        catalogue[plan_id] = entry
+
+    if changed or set(catalogue) != set(index):
+        try:
+            Path(cache_dir).mkdir(exist_ok=True)
+            with index_path.open("w") as f:
+                json.dump(catalogue, f, indent=2)
+        except OSError:
+            pass
+    return catalogue
+
+
+def save_uploaded_plan(filename, data, plans_dir=PLANS_DIR):
+    """Validate an uploaded plan CSV and add it to the library. Returns the new plan id.
+
+    The library is shared between users, so an upload never replaces an
+    existing plan; a name that's taken gets a numeric suffix instead.
+    """
+    text = data.decode("utf-8-sig")
+    parse_plan_csv(text)
+    stem = re.sub(r"[^a-z0-9]+", "_", os.path.splitext(filename)[0].lower()).strip("_") or "plan"
+    Path(plans_dir).mkdir(exist_ok=True)
+    n = 1
+    while True:
+        plan_id = f"custom_{stem}" if n == 1 else f"custom_{stem}_{n}"
+        try:
+            # "x" mode claims the name atomically, so concurrent uploads can't collide
+            with _plan_path(plan_id, plans_dir).open("x", encoding="utf-8") as f:
+                f.write(text)
+            return plan_id
+        except FileExistsError:
+            n += 1
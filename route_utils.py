@@ -0,0 +1,158 @@
+import math
+from pathlib import Path
+
+import numpy as np
+
+ROUTE_CACHE_DIR = ".route_cache"
+
+# Simplify to within about this many screen pixels at the target zoom
+PIXEL_TOLERANCE = 1.5
+# Point budget for a single route at zoom 0; doubles every two zoom levels
+BASE_POINT_BUDGET = 40
+MAX_POINT_BUDGET = 2000
+
+_routes = {}
+
+
+def decode_polylines(encoded_list):
+    """Decode many Google-encoded polylines at once into (n, 2) float32 [lat, lng] arrays.
+
+    All strings are decoded in one vectorized pass: characters become 5-bit
+    chunks, chunk groups are summed into zigzag-encoded deltas, and deltas are
+    cumulatively summed per polyline.
+    """
+    encoded_list = [p or "" for p in encoded_list]
+    if not any(encoded_list):
+        return [np.empty((0, 2), dtype=np.float32) for _ in encoded_list]
+
+    raw = np.frombuffer("".join(encoded_list).encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    is_last = (raw & 0x20) == 0
+    # Index of the value each character belongs to, and its position within that value
+    value_id = np.concatenate(([0], np.cumsum(is_last)[:-1]))
+    starts = np.flatnonzero(np.concatenate(([True], is_last[:-1])))
+    position = np.arange(len(raw)) - np.repeat(starts, np.diff(np.append(starts, len(raw))))
+    values = np.bincount(value_id, weights=(raw & 0x1F) << (5 * position)).astype(np.int64)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+
+    # Every polyline ends on a complete value, so per-polyline value counts follow from its characters
+    char_ends = np.cumsum([len(p) for p in encoded_list])
+    value_ends = np.concatenate(([0], np.cumsum(is_last)))[char_ends]
+    routes = []
+    begin = 0
+    for end in value_ends:
+        pairs = deltas[begin:end - (end - begin) % 2].reshape(-1, 2)
+        routes.append((np.cumsum(pairs, axis=0) / 1e5).astype(np.float32))
+        begin = end
+    return routes
+
+
+def douglas_peucker_importance(points):
+    """Tolerance at which each point stops being kept by Douglas-Peucker.
+
+    Running the recursion once with no threshold and recording each split's
+    distance (capped by its parent's, so the result is monotone) lets any
+    tolerance or point budget be applied afterwards with a comparison or sort.
+    Endpoints get infinite importance.
+    """
+    n = len(points)
+    importance = np.full(n, np.inf)
+    if n < 3:
+        return importance
+    pts = points.astype(np.float64)
+    importance[1:n - 1] = 0.0
+    stack = [(0, n - 1, np.inf)]
+    while stack:
+        first, last, cap = stack.pop()
+        if last - first < 2:
+            continue
+        seg = pts[last] - pts[first]
+        rel = pts[first + 1:last] - pts[first]
+        seg_len = math.hypot(seg[0], seg[1])
+        if seg_len == 0:
+            dist = np.hypot(rel[:, 0], rel[:, 1])
+        else:
+            dist = np.abs(seg[0] * rel[:, 1] - seg[1] * rel[:, 0]) / seg_len
+        i = int(np.argmax(dist))
+        split = first + 1 + i
+        value = min(float(dist[i]), cap)
+        importance[split] = value
+        stack.append((first, split, value))
+        stack.append((split, last, value))
+    return importance
+
+
+def zoom_tolerance(zoom):
+    """Tolerance in degrees equal to PIXEL_TOLERANCE screen pixels at a web-map zoom level."""
+    return PIXEL_TOLERANCE * 360.0 / (256 * 2 ** zoom)
+
+
+def point_budget(zoom):
+    """Maximum points to draw for one route at a zoom level."""
+    return int(min(MAX_POINT_BUDGET, BASE_POINT_BUDGET * 2 ** (zoom / 2)))
+
+
+def simplify_route(route, zoom, max_points=None):
+    """Douglas-Peucker simplify a cached route for display at zoom.
+
+    route is a [lat, lng, importance] array from get_routes. Returns [lat, lng]
+    points within the zoom's pixel tolerance, capped at its point budget.
+    """
+    max_points = max(2, max_points or point_budget(zoom))
+    importance = route[:, 2]
+    kept = np.flatnonzero(importance > zoom_tolerance(zoom))
+    if len(kept) > max_points:
+        kept = np.sort(np.argsort(-importance, kind="stable")[:max_points])
+    return route[kept, :2]
+
+
+def fit_zoom(routes, width_px=800):
+    """Web-map zoom level that fits the bounding box of the given routes."""
+    routes = [r[:, :2] for r in routes if len(r)]
+    if not routes:
+        return 0.0
+    stacked = np.concatenate(routes)
+    lat_span, lng_span = np.ptp(stacked, axis=0)
+    # Longitude degrees shrink with latitude; use the wider of the two spans
+    span = max(float(lng_span), float(lat_span) / max(math.cos(math.radians(float(stacked[:, 0].mean()))), 0.1), 1e-4)
+    return max(0.0, min(18.0, math.log2(360.0 * width_px / (256 * span))))
+
+
+def get_routes(polylines, cache_dir=ROUTE_CACHE_DIR):
+    """Decoded routes for {activity_id: summary_polyline}, cached in memory and on disk.
+
+    Each route is an (n, 3) float32 array of lat, lng and Douglas-Peucker
+    importance, so simplifying for any zoom later needs no geometry work.
+    """
+    routes = {}
+    missing = []
+    for activity_id, polyline in polylines.items():
+        key = str(activity_id)
+        if key in _routes:
+            routes[key] = _routes[key]
+            continue
+        path = Path(cache_dir) / f"{key}.npy"
+        try:
+            routes[key] = _routes[key] = np.load(path)
+            continue
+        except (OSError, ValueError):
+            missing.append((key, polyline))
+
+    if missing:
+        decoded = decode_polylines([polyline for _, polyline in missing])
+        try:
+            Path(cache_dir).mkdir(exist_ok=True)
+        except OSError:
+            pass
+        for (key, _), points in zip(missing, decoded):
+            route = np.column_stack((points, douglas_peucker_importance(points))).astype(np.float32)
+            routes[key] = _routes[key] = route
+            try:
+                np.save(Path(cache_dir) / f"{key}.npy", route)
+            except OSError:
+                pass
+    return routes
+
+
+def to_lnglat(points, decimals=5):
+    """[[lng, lat], ...] rounded for compact JSON, the order deck.gl expects."""
+    return np.round(points[:, ::-1].astype(np.float64), decimals).tolist()
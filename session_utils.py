@@ -0,0 +1,216 @@
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from pathlib import Path
+
+import requests
+import yaml
+
+SESSIONS_FILE = "sessions.json"
+CONFIG_FILE = "config.yaml"
+
+# Profile fields we keep in the session table; the access token never leaves the server.
+PROFILE_FIELDS = ("email", "name", "picture")
+
+# Don't hit the userinfo endpoint more than once per this many seconds per session
+REVALIDATE_INTERVAL = 6 * 3600
+
+_sessions_lock = threading.Lock()
+_revalidating = set()
+
+
+def load_cookie_config(config_path=CONFIG_FILE):
+    """Read the cookie name and expiry_days from config.yaml.
+
+    The signing key in config.yaml is a committed placeholder, so it is never
+    used; callers must supply a key from secrets or the environment.
+    """
+    cookie = {"name": "marathon_planner_session", "expiry_days": 30}
+    try:
+        with open(config_path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+        section = config.get("cookie") or {}
+        cookie.update({k: section[k] for k in ("name", "expiry_days") if section.get(k) is not None})
+    except Exception:
+        pass
+    cookie["expiry_days"] = float(cookie.get("expiry_days") or 30)
+    cookie["key"] = None
+    return cookie
+
+
+def _sign(session_id, expires_at, key):
+    msg = f"{session_id}.{expires_at}".encode()
+    return hmac.new(key.encode(), msg, hashlib.sha256).hexdigest()
+
+
+def _load_sessions():
+    path = Path(SESSIONS_FILE)
+    if not path.exists():
+        return {}
+    try:
+        with path.open("r") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def _save_sessions(sessions):
+    # Write then rename: a torn sessions.json would load as {} and the next save would drop everyone's sessions
+    path = Path(SESSIONS_FILE)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w") as f:
+        json.dump(sessions, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _purge_expired(sessions, now):
+    return {sid: s for sid, s in sessions.items() if s.get("expires_at", 0) > now}
+
+
+def create_session(user, key, expiry_days, refresh_token=None):
+    """Store the user's profile server-side and return a signed cookie value for it.
+
+    The Google refresh token is kept so the profile can be revalidated after
+    the short-lived access token has expired.
+    """
+    now = int(time.time())
+    expires_at = now + int(expiry_days * 86400)
+    session_id = secrets.token_urlsafe(24)
+    record = {field: user.get(field) for field in PROFILE_FIELDS}
+    record.update({
+        "access_token": user.get("access_token"),
+        "refresh_token": refresh_token,
+        "created_at": now,
+        "expires_at": expires_at,
+        "validated_at": now,
+    })
+    with _sessions_lock:
+        sessions = _purge_expired(_load_sessions(), now)
+        sessions[session_id] = record
+        _save_sessions(sessions)
+    return f"{session_id}.{expires_at}.{_sign(session_id, expires_at, key)}"
+
+
+def parse_session_cookie(cookie_value, key):
+    """Verify a cookie's signature and expiry. Returns the session id or None."""
+    if not cookie_value or not key:
+        return None
+    try:
+        session_id, expires_at, signature = cookie_value.rsplit(".", 2)
+        expires_at = int(expires_at)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(signature, _sign(session_id, expires_at, key)):
+        return None
+    if expires_at <= time.time():
+        return None
+    return session_id
+
+
+def resume_session(cookie_value, key):
+    """Restore the cached user for a signed cookie without any network calls.
+
+    Returns (session_id, user) or (None, None) if the cookie is invalid or the
+    server-side session has expired or been revoked.
+    """
+    session_id = parse_session_cookie(cookie_value, key)
+    if session_id is None:
+        return None, None
+    with _sessions_lock:
+        record = _load_sessions().get(session_id)
+    if not record or record.get("expires_at", 0) <= time.time():
+        return None, None
+    user = {field: record.get(field) for field in PROFILE_FIELDS}
+    user["access_token"] = record.get("access_token")
+    if not user["email"]:
+        return None, None
+    return session_id, user
+
+
+def revoke_session(session_id):
+    """Remove a session from the server-side table."""
+    if not session_id:
+        return
+    with _sessions_lock:
+        sessions = _load_sessions()
+        if sessions.pop(session_id, None) is not None:
+            _save_sessions(sessions)
+
+
+def _refresh_access_token(refresh_token, token_url, client_id, client_secret):
+    """Exchange a refresh token for a new access token. Returns None if Google refuses it."""
+    response = requests.post(token_url, data={
+        "client_id": client_id,
+        "client_secret": client_secret,
+        "grant_type": "refresh_token",
+        "refresh_token": refresh_token,
+    }, timeout=10)
+    if response.status_code >= 500:
+        response.raise_for_status()
+    if response.status_code != 200:
+        return None
+    return response.json().get("access_token")
+
+
+def _revalidate(session_id, refresh_token, google):
+    try:
+        access_token = _refresh_access_token(
+            refresh_token, google["token_url"], google["client_id"], google["client_secret"]
+        )
+        info = None
+        if access_token:
+            headers = {"Authorization": f"Bearer {access_token}"}
+            response = requests.get(google["userinfo_url"], headers=headers, timeout=10)
+            if response.status_code >= 500:
+                response.raise_for_status()
+            if response.status_code == 200:
+                info = response.json()
+        with _sessions_lock:
+            sessions = _load_sessions()
+            record = sessions.get(session_id)
+            if record is None:
+                return
+            # Email is the identity key for user settings, so a changed or unverifiable identity ends the session
+            if not info or info.get("email") != record.get("email"):
+                del sessions[session_id]
+            else:
+                record["name"] = info.get("name", record.get("name"))
+                record["picture"] = info.get("picture", record.get("picture", ""))
+                record["access_token"] = access_token
+                record["validated_at"] = int(time.time())
+            _save_sessions(sessions)
+    except requests.RequestException:
+        # Network trouble or a Google outage isn't a verdict on the session; try again on a later load
+        pass
+    finally:
+        _revalidating.discard(session_id)
+
+
+def revalidate_profile_async(session_id, google):
+    """Refresh the cached profile in a background thread if it's stale.
+
+    google holds client_id, client_secret, token_url and userinfo_url. Sessions
+    that can't be revalidated (no refresh token, refresh refused, or a different
+    account) are revoked, so they stop resuming on later loads.
+    """
+    if not session_id or session_id in _revalidating:
+        return
+    with _sessions_lock:
+        record = _load_sessions().get(session_id)
+    if not record:
+        return
+    if time.time() - record.get("validated_at", 0) < REVALIDATE_INTERVAL:
+        return
+    if not record.get("refresh_token"):
+        revoke_session(session_id)
+        return
+    _revalidating.add(session_id)
+    threading.Thread(
+        target=_revalidate,
+        args=(session_id, record["refresh_token"], google),
+        daemon=True,
+    ).start()